@@ -0,0 +1,92 @@
+"""Compare the peak RSS of the tag index against the previous representation.
+
+The previous representation kept every file's lines in its Entry, and lists of
+Entry objects in each Tag. Each variant runs in its own process on the same
+synthetic source tree. Requires the ``resource`` module (Linux/macOS).
+
+Run with::
+
+    python benchmarks/bench_memory.py [number of pages]
+"""
+
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+BODY = "Some paragraph text, with a few commas, that is not a tag block.\n" * 60
+
+
+def create_sources(srcdir, n_pages):
+    for i in range(n_pages):
+        tags = ", ".join(f"tag_{(i * k) % 50}" for k in (1, 3, 7))
+        page = Path(srcdir) / f"dir_{i % 100}" / f"page_{i}.rst"
+        page.parent.mkdir(exist_ok=True)
+        page.write_text(f"Page {i}\n=======\n\n.. tags:: {tags}\n\n{BODY}")
+
+
+def run_compact(srcdir):
+    from sphinx_tags import assign_entries
+
+    app = SimpleNamespace(
+        srcdir=srcdir,
+        config=SimpleNamespace(
+            tags_extension=["rst"], exclude_patterns=[], tags_output_dir="_tags"
+        ),
+    )
+    return assign_entries(app)
+
+
+def run_legacy(srcdir):
+    from sphinx_tags import _normalize_display_tag
+
+    class Entry:
+        def __init__(self, filepath):
+            self.filepath = filepath
+            self.lines = filepath.read_text(encoding="utf8").split("\n")
+            line = next(line for line in self.lines if ".. tags::" in line)
+            tags = line.split(".. tags::")[1].split(",")
+            self.tags = [_normalize_display_tag(tag) for tag in tags if tag]
+
+    class Tag:
+        def __init__(self, name):
+            self.items = []
+            self.name = name
+
+    tags, pages = {}, []
+    for filepath in sorted(Path(srcdir).glob("**/*.rst")):
+        entry = Entry(filepath)
+        for tag in entry.tags:
+            tags.setdefault(tag, Tag(tag)).items.append(entry)
+        pages.append(entry)
+    return tags, pages
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def main(n_pages=20000):
+    with tempfile.TemporaryDirectory() as srcdir:
+        create_sources(srcdir, n_pages)
+        print(f"{n_pages} pages")
+        for variant in ("legacy", "compact"):
+            output = subprocess.check_output(
+                [sys.executable, __file__, "--run", variant, srcdir], text=True
+            )
+            print(f"{variant:<8} peak RSS: {float(output):8.1f} MB")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        variant, srcdir = sys.argv[2:4]
+        before = peak_rss_mb()
+        # keep the result alive until the peak RSS is measured
+        result = {"legacy": run_legacy, "compact": run_compact}[variant](srcdir)
+        print(peak_rss_mb() - before)
+    else:
+        main(*map(int, sys.argv[1:]))
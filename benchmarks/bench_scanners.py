@@ -0,0 +1,35 @@
+"""Benchmark each registered tag scanner on synthetic tagged and untagged sources.
+
+Run with::
+
+    python benchmarks/bench_scanners.py
+"""
+
+import timeit
+
+from sphinx_tags import get_tag_scanner
+
+BODY = "Some paragraph text, with a few commas, that is not a tag block.\n" * 500
+
+SOURCES = {
+    ".rst": ("Title\n=====\n\n.. tags:: tag_1, tag2, tag 3\n\n", BODY),
+    ".md": ("# Title\n\n```{tags} tag_1, tag2, tag 3\n```\n\n", BODY),
+    ".ipynb": ('   "source": [\n    ".. tags:: tag_1, tag2, tag 3"\n   ]\n', BODY),
+}
+
+
+def main(number=2000):
+    print(f"{'suffix':<8} {'tagged (us)':>12} {'untagged (us)':>14}")
+    for suffix, (header, body) in SOURCES.items():
+        scanner = get_tag_scanner(suffix)
+        tagged = header + body
+        tagged_time = timeit.timeit(lambda: scanner(tagged), number=number)
+        untagged_time = timeit.timeit(lambda: scanner(body), number=number)
+        print(
+            f"{suffix:<8} {tagged_time / number * 1e6:>12.2f}"
+            f" {untagged_time / number * 1e6:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
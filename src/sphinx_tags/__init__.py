@@ -4,11 +4,14 @@
 
 import os
 import re
+import sys
+from array import array
 from fnmatch import fnmatch
 from pathlib import Path
-from typing import List
+from typing import Callable, Iterator, List, Optional
 
 from docutils import nodes
+from sphinx import addnodes
 from sphinx.errors import ExtensionError
 from sphinx.util.docutils import SphinxDirective
 from sphinx.util.logging import getLogger
@@ -19,6 +22,10 @@ __version__ = "0.4"
 
 logger = getLogger("sphinx-tags")
 
+# builder-inited priority for writing tag pages, once extensions connected with
+# the default priority (500) have generated their sources
+TAGS_UPDATE_PRIORITY = 800
+
 
 class TagLinks(SphinxDirective):
     """Custom directive for adding tags to Sphinx-generated files.
@@ -75,33 +82,22 @@ class TagLinks(SphinxDirective):
         # (can happen after _normalize_tag())
         page_tags = list(filter(None, page_tags))
 
-        tag_dir = Path(self.env.app.srcdir) / self.env.app.config.tags_output_dir
         result = nodes.paragraph()
         result["classes"] = ["tags"]
         result += nodes.inline(text=f"{self.env.app.config.tags_intro_text} ")
         count = 0
 
-        current_doc_dir = Path(self.env.doc2path(self.env.docname)).parent
-        relative_tag_dir = Path(os.path.relpath(tag_dir, current_doc_dir))
-
         for tag in page_tags:
             count += 1
-            # We want the link to be the path to the _tags folder, relative to
-            # this document's path where
-            #
-            #  - self.env.app.config.tags_output_dir
-            # |
-            #  - subfolder
-            #   |
-            #    - current_doc_path
-
+            # Tags link to the ref label of their tag page rather than to a file
+            # path, so that links are resolved at write time for each builder
             file_basename = _normalize_tag(tag, dashes=True)
 
             if self.env.app.config.tags_create_badges:
-                result += self._get_badge_node(tag, file_basename, relative_tag_dir)
+                result += self._get_badge_node(tag, file_basename)
                 tag_separator = " "
             else:
-                result += self._get_plaintext_node(tag, file_basename, relative_tag_dir)
+                result += self._get_plaintext_node(tag, file_basename)
                 tag_separator = f"{self.separator} "
             if not count == len(page_tags):
                 result += nodes.inline(text=tag_separator)
@@ -111,16 +107,20 @@ class TagLinks(SphinxDirective):
 
         return [result]
 
-    def _get_plaintext_node(
-        self, tag: str, file_basename: str, relative_tag_dir: Path
-    ) -> List[nodes.Node]:
+    def _get_plaintext_node(self, tag: str, file_basename: str) -> List[nodes.Node]:
         """Get a plaintext reference link for the given tag"""
-        link = relative_tag_dir / f"{file_basename}.html"
-        return nodes.reference(refuri=str(link), text=tag)
+        node = addnodes.pending_xref(
+            "",
+            refdomain="std",
+            reftype="ref",
+            reftarget=_tag_ref_label(file_basename),
+            refexplicit=True,
+            refwarn=True,
+        )
+        node += nodes.inline(tag, tag, classes=["xref", "std", "std-ref"])
+        return node
 
-    def _get_badge_node(
-        self, tag: str, file_basename: str, relative_tag_dir: Path
-    ) -> List[nodes.Node]:
+    def _get_badge_node(self, tag: str, file_basename: str) -> List[nodes.Node]:
         """Get a sphinx-design reference badge for the given tag"""
         from sphinx_design.badges_buttons import XRefBadgeRole
 
@@ -128,8 +128,7 @@ class TagLinks(SphinxDirective):
         # Typically this would be done when parsing the role from document text.
         text_nodes, messages = self.state.inline_text("", self.lineno)
 
-        # Ref paths always use forward slashes, even on Windows
-        tag_ref = f"{tag} <{relative_tag_dir.as_posix()}/{file_basename}>"
+        tag_ref = f"{tag} <{_tag_ref_label(file_basename)}>"
         tag_color = self._get_tag_color(tag)
         tag_badge = XRefBadgeRole(tag_color)
         return tag_badge(
@@ -154,8 +153,12 @@ class TagLinks(SphinxDirective):
 class Tag:
     """A tag contains entries"""
 
+    __slots__ = ("items", "name", "file_basename")
+
     def __init__(self, name):
-        self.items = []
+        # ids of the documents with this tag, i.e. their index in the pages
+        # list returned by assign_entries()
+        self.items = array("I")
         self.name = _normalize_display_tag(name)
         self.file_basename = _normalize_tag(name, dashes=True)
 
@@ -182,7 +185,7 @@ class Tag:
         tags_output_dir : Path
             path where the file for this tag will be created
         items : list
-            list of files associated with this tag (instance of Entry)
+            list of document paths associated with this tag, relative to srcdir
         extension : {["rst"], ["md"], ["rst", "md"]}
             list of file extensions used.
         srcdir : str
@@ -197,8 +200,8 @@ class Tag:
 
         """
         # Get sorted file paths for tag pages, relative to /docs/_tags
-        tag_page_paths = sorted([i.relpath(srcdir) for i in items])
-        ref_label = f"sphx_tag_{self.file_basename}"
+        tag_page_paths = sorted(items)
+        ref_label = _tag_ref_label(self.file_basename)
 
         content = []
         if "md" in extension:
@@ -230,68 +233,144 @@ class Tag:
                 content.append(f"    ../{path}")
 
         content.append("")
-        with open(
-            os.path.join(srcdir, tags_output_dir, filename), "w", encoding="utf8"
-        ) as f:
-            f.write("\n".join(content))
+        filename = os.path.join(srcdir, tags_output_dir, filename)
+        _write_source(filename, "\n".join(content))
+        return filename
 
 
 class Entry:
     """Tags to pages map"""
 
-    def __init__(self, entrypath: Path):
-        self.filepath = entrypath
-        # self.tags = tags
-        # Read tags (for the first time) to create the tag pages
-        self.lines = self.filepath.read_text(encoding="utf8").split("\n")
-        if self.filepath.suffix == ".rst":
-            tagstart = ".. tags::"
-            tagend = ""  # empty line
-        elif self.filepath.suffix == ".md":
-            tagstart = "```{tags}"
-            tagend = "```"
-        elif self.filepath.suffix == ".ipynb":
-            tagstart = '".. tags::'
-            tagend = "]"
-        else:
-            raise ValueError(
-                "Unknown file extension. Currently, only .rst, .md .ipynb are supported."
-            )
+    __slots__ = ("filepath", "tags")
 
-        # tagline = [line for line in self.lines if tagstart in line]
-        # tagblock is all content until the next new empty line
-        tagblock = []
-        reading = False
-        for line in self.lines:
-            line = line.strip()
-            if tagstart in line:
-                reading = True
-                line = line.split(tagstart)[1]
-                tagblock.extend(line.split(","))
-            else:
-                if reading and line == tagend:
-                    # tagblock now contains at least one tag
-                    if tagblock != [""]:
-                        break
-                if reading:
-                    tagblock.extend(line.split(","))
-
-        self.tags = []
-        if tagblock:
-            self.tags = [_normalize_display_tag(tag) for tag in tagblock if tag]
-
-    def assign_to_tags(self, tag_dict):
-        """Append ourself to tags"""
+    def __init__(self, entrypath: Path, tags: Optional[tuple] = None):
+        self.filepath = entrypath
+        if tags is not None:
+            # Tags already read from the same file through another path
+            self.tags = tags
+            return
+        # Read tags (for the first time) to create the tag pages. Only the tags
+        # are kept, and identical tag names are shared between entries.
+        scanner = get_tag_scanner(self.filepath.suffix)
+        tagblock = scanner(self.filepath.read_text(encoding="utf8"))
+        tags = (_normalize_display_tag(tag) for tag in tagblock)
+        self.tags = tuple(dict.fromkeys(sys.intern(tag) for tag in tags if tag))
+
+    def assign_to_tags(self, tag_dict, doc_id: int):
+        """Append our document id to tags"""
         for tag in self.tags:
             if tag not in tag_dict:
                 tag_dict[tag] = Tag(tag)
-            tag_dict[tag].items.append(self)
+            tag_dict[tag].items.append(doc_id)
 
     def relpath(self, root_dir) -> str:
         """Get this entry's path relative to the given root directory"""
         return Path(os.path.relpath(self.filepath, root_dir)).as_posix()
 
 
+_MYST_FENCE_RE = re.compile(r"^[ \t]*(`{3,}|:{3,})\{tags\}(.*)$", re.MULTILINE)
+
+
+def _iter_lines(text: str, start: int) -> Iterator[str]:
+    """Lazily yield stripped lines of ``text`` from index ``start`` onwards, so
+    that scanners can stop reading as soon as the tag block is complete."""
+    while start <= len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end].strip()
+        start = end + 1
+
+
+def _scan_rst(text: str) -> List[str]:
+    """Return raw tags from the first ``.. tags::`` directive in reST source.
+
+    The tag block ends at the first empty line after at least one tag was
+    found.
+    """
+    start = text.find(".. tags::")
+    if start == -1:
+        return []
+    lines = _iter_lines(text, start + len(".. tags::"))
+    tagblock = next(lines).split(",")
+    for line in lines:
+        if not line:
+            if any(tag.strip() for tag in tagblock):
+                break
+            continue
+        tagblock.extend(line.split(","))
+    return tagblock
+
+
+def _scan_myst(text: str) -> List[str]:
+    """Return raw tags from the first ``{tags}`` directive in MyST source.
+
+    Both backtick and colon fences are recognized.
+    """
+    if "{tags}" not in text:
+        return []
+    match = _MYST_FENCE_RE.search(text)
+    if match is None:
+        return []
+    fence = match.group(1)
+    tagblock = match.group(2).split(",")
+    for line in _iter_lines(text, match.end() + 1):
+        if line.startswith(fence) and not line.strip(fence[0]):
+            break
+        tagblock.extend(line.split(","))
+    return tagblock
+
+
+def _scan_ipynb(text: str) -> List[str]:
+    """Return raw tags from the first ``.. tags::`` directive in a raw notebook cell."""
+    start = text.find('".. tags::')
+    if start == -1:
+        return []
+    lines = _iter_lines(text, start + len('".. tags::'))
+    tagblock = next(lines).split(",")
+    for line in lines:
+        if line == "]":
+            break
+        tagblock.extend(line.split(","))
+    return tagblock
+
+
+_TAG_SCANNERS = {}
+
+
+def register_tag_scanner(suffix: str, scanner: Callable[[str], List[str]]):
+    """Register a function that finds tags in source files with a given suffix.
+
+    Parameters
+    ----------
+    suffix : str
+        file suffix handled by the scanner, e.g. ``".rst"``
+    scanner : callable
+        function receiving the file contents and returning a list of raw tag
+        strings. Tags are normalized afterwards, and empty strings are dropped.
+    """
+    if not suffix.startswith("."):
+        suffix = f".{suffix}"
+    _TAG_SCANNERS[suffix] = scanner
+
+
+def get_tag_scanner(suffix: str) -> Callable[[str], List[str]]:
+    """Get the tag scanner registered for a file suffix."""
+    try:
+        return _TAG_SCANNERS[suffix]
+    except KeyError:
+        raise ValueError(
+            f"Unknown file extension '{suffix}'. Currently, only "
+            f"{', '.join(sorted(_TAG_SCANNERS))} are supported."
+        ) from None
+
+
+register_tag_scanner(".rst", _scan_rst)
+register_tag_scanner(".txt", _scan_rst)
+register_tag_scanner(".md", _scan_myst)
+register_tag_scanner(".ipynb", _scan_ipynb)
+
+
 def _normalize_tag(tag: str, dashes: bool = False) -> str:
     """Normalize a tag name to use in output filenames and tag URLs.
     Replace whitespace and other non-alphanumeric characters with dashes.
@@ -304,6 +383,11 @@ def _normalize_tag(tag: str, dashes: bool = False) -> str:
     return re.sub(r"[\s\W]+", char, tag).lower().strip(char)
 
 
+def _tag_ref_label(file_basename: str) -> str:
+    """Get the ref label of the page for a tag, from its normalized name."""
+    return f"sphx_tag_{file_basename}"
+
+
 def _normalize_display_tag(tag: str) -> str:
     """Strip extra whitespace from a tag name for display purposes.
 
@@ -360,68 +444,281 @@ def tagpage(tags, outdir, title, extension, tags_index_head):
         content.append("")
         filename = os.path.join(outdir, "tagsindex.rst")
 
+    _write_source(filename, "\n".join(content))
+    return filename
+
+
+def _write_source(filename, content):
+    """Write a generated source file, unless it already has this content, so
+    that Sphinx does not read it again."""
+    if os.path.exists(filename):
+        with open(filename, encoding="utf8") as f:
+            if f.read() == content:
+                return
     with open(filename, "w", encoding="utf8") as f:
-        f.write("\n".join(content))
+        f.write(content)
 
 
-def assign_entries(app):
-    """Assign all found entries to their tag."""
-    pages = []
-    tags = {}
+def _file_key(filepath: Path) -> tuple:
+    """Identify the physical file behind a (possibly symlinked) path.
+
+    Falls back to the resolved path on file systems without inode numbers.
+    """
+    stat = filepath.stat()
+    if stat.st_ino:
+        return (stat.st_dev, stat.st_ino)
+    return (os.path.realpath(filepath),)
+
+
+def scan_entries(app):
+    """Scan source documents for tags.
+
+    Returns
+    -------
+    dict
+        maps document paths, relative to the source directory, to
+        ``(key, Entry)`` pairs, where ``key`` identifies the physical file
+        (see ``_file_key``). Paths to the same file, e.g. through symlinks,
+        share the tags of a single read.
+    """
+    entries = {}
+    # Tags of each physical file scanned so far
+    scanned = {}
 
-    # Get document paths in the project that match specified file extensions
+    # Get document paths in the project that match specified file extensions,
+    # leaving out the tag pages generated by earlier builds
+    tags_output_dir = Path(app.config.tags_output_dir).as_posix()
     doc_paths = get_matching_files(
         app.srcdir,
         include_patterns=[f"**.{extension}" for extension in app.config.tags_extension],
-        exclude_patterns=app.config.exclude_patterns,
+        exclude_patterns=[*app.config.exclude_patterns, f"{tags_output_dir}/**"],
     )
 
     for path in doc_paths:
-        entry = Entry(Path(app.srcdir) / path)
-        entry.assign_to_tags(tags)
-        pages.append(entry)
+        filepath = Path(app.srcdir) / path
+        key = _file_key(filepath)
+        if key in scanned:
+            entry = Entry(filepath, tags=scanned[key])
+        else:
+            entry = Entry(filepath)
+        scanned.setdefault(key, entry.tags)
+        entries[path] = (key, entry)
+
+    return entries
+
+
+def assign_entries(app, entries=None):
+    """Assign all found entries to their tag.
+
+    Returns
+    -------
+    tags : dict
+        maps tag names to Tag objects
+    pages : list
+        paths of the scanned documents relative to the source directory. A
+        document's index in this list is its id in ``Tag.items``.
+    """
+    pages = []
+    tags = {}
+
+    if entries is None:
+        entries = scan_entries(app)
+
+    for _, entry in entries.values():
+        entry.assign_to_tags(tags, len(pages))
+        pages.append(entry.relpath(app.srcdir))
 
     return tags, pages
 
 
+def select_tags(app, tags, pages):
+    """Restrict the build to documents with one of the tags in ``tags_only``.
+
+    The selected docnames, together with the root document, are stored as
+    ``app.tags_only_docs``; all other documents are left out of the build by
+    the ``tags_only`` event handlers. The returned tags only list the selected
+    documents, and tags without any of them are dropped.
+    """
+    tags_only = app.config.tags_only
+    if isinstance(tags_only, str):
+        tags_only = [tags_only]
+    only = {_normalize_tag(tag, dashes=True) for tag in tags_only}
+
+    selected = set()
+    for tag in tags.values():
+        if tag.file_basename in only:
+            selected.update(tag.items)
+    # The root document is always built, so its tags must have pages as well
+    for doc_id, path in enumerate(pages):
+        if os.path.splitext(path)[0] == app.config.root_doc:
+            selected.add(doc_id)
+
+    app.tags_only_docs = {os.path.splitext(pages[doc_id])[0] for doc_id in selected}
+    # The root document may not be scanned, if its suffix is not in tags_extension
+    app.tags_only_docs.add(app.config.root_doc)
+    logger.info(
+        f"Building {len(selected)} of {len(pages)} scanned documents "
+        f"(tags_only={', '.join(tags_only)})",
+        color="white",
+    )
+
+    selected_tags = {}
+    for name, tag in tags.items():
+        items = array("I", (doc_id for doc_id in tag.items if doc_id in selected))
+        if items:
+            tag.items = items
+            selected_tags[name] = tag
+    return selected_tags
+
+
+def exclude_unselected_docs(app, env, added, changed, removed):
+    """Leave documents without a ``tags_only`` tag out of the build.
+
+    Documents kept from an earlier build are removed from the environment. Also
+    returns the documents whose toctrees were pruned of documents that are now
+    part of the build, so that they are read again.
+    """
+    selected = app.tags_only_docs
+    app.tags_only_excluded = set()
+    if selected is not None:
+        tags_dir = f"{Path(app.config.tags_output_dir).as_posix()}/"
+        app.tags_only_excluded = {
+            docname
+            for docname in env.found_docs
+            if docname not in selected and not docname.startswith(tags_dir)
+        }
+        removed.update(app.tags_only_excluded & env.all_docs.keys())
+
+    pruned = getattr(env, "tags_pruned_toctrees", {})
+    return [
+        docname
+        for docname, docnames in pruned.items()
+        if docnames - app.tags_only_excluded
+    ]
+
+
+def skip_unselected_docs(app, env, docnames):
+    """Don't read documents left out of the build by ``tags_only``."""
+    if app.tags_only_excluded:
+        docnames[:] = [d for d in docnames if d not in app.tags_only_excluded]
+
+
+def prune_toctrees(app, doctree):
+    """Remove toctree entries for documents left out of the build by
+    ``tags_only``, which would otherwise be reported as missing."""
+    if not app.tags_only_excluded:
+        return
+    pruned = set()
+    for toctree in doctree.findall(addnodes.toctree):
+        entries = [
+            (title, ref)
+            for title, ref in toctree["entries"]
+            if ref not in app.tags_only_excluded
+        ]
+        includefiles = [
+            docname
+            for docname in toctree["includefiles"]
+            if docname not in app.tags_only_excluded
+        ]
+        pruned.update(set(toctree["includefiles"]) - set(includefiles))
+        toctree["entries"] = entries
+        toctree["includefiles"] = includefiles
+    if pruned:
+        if not hasattr(app.env, "tags_pruned_toctrees"):
+            app.env.tags_pruned_toctrees = {}
+        app.env.tags_pruned_toctrees[app.env.docname] = pruned
+
+
+def purge_pruned_toctrees(app, env, docname):
+    """Forget the pruned toctrees of a document that is read again."""
+    if hasattr(env, "tags_pruned_toctrees"):
+        env.tags_pruned_toctrees.pop(docname, None)
+
+
+def merge_pruned_toctrees(app, env, docnames, other):
+    """Merge the pruned toctrees of documents read in parallel."""
+    if hasattr(other, "tags_pruned_toctrees"):
+        if not hasattr(env, "tags_pruned_toctrees"):
+            env.tags_pruned_toctrees = {}
+        for docname in docnames:
+            if docname in other.tags_pruned_toctrees:
+                env.tags_pruned_toctrees[docname] = other.tags_pruned_toctrees[docname]
+
+
+def drop_unselected_docs(app, env):
+    """Don't write documents left out of the build by ``tags_only``."""
+    env.found_docs.difference_update(app.tags_only_excluded)
+    return []
+
+
 def update_tags(app):
     """Update tags according to pages found"""
+    app.tags_only_docs = None
+    app.tags_only_excluded = set()
     if app.config.tags_create_tags:
         tags_output_dir = Path(app.config.tags_output_dir)
 
         if not os.path.exists(os.path.join(app.srcdir, tags_output_dir)):
             os.makedirs(os.path.join(app.srcdir, tags_output_dir))
 
-        for file in os.listdir(os.path.join(app.srcdir, tags_output_dir)):
-            if file.endswith("md") or file.endswith("rst"):
-                os.remove(os.path.join(app.srcdir, tags_output_dir, file))
-
-        # Create pages for each tag
-        tags, pages = assign_entries(app)
+        entries = scan_entries(app)
+        tags, pages = assign_entries(app, entries)
+        if app.config.tags_only:
+            tags = select_tags(app, tags, pages)
 
+        created = set()
         for tag in tags.values():
-            tag.create_file(
-                [item for item in pages if tag.name in item.tags],
+            filename = tag.create_file(
+                [pages[doc_id] for doc_id in tag.items],
                 app.config.tags_extension,
                 tags_output_dir,
                 app.srcdir,
                 app.config.tags_page_title,
                 app.config.tags_page_header,
             )
+            created.add(filename)
 
         # Create tags overview page
-        tagpage(
+        filename = tagpage(
             tags,
             os.path.join(app.srcdir, tags_output_dir),
             app.config.tags_overview_title,
             app.config.tags_extension,
             app.config.tags_index_head,
         )
-        logger.info("Tags updated", color="white")
+        created.add(filename)
+
+        # Remove pages of tags that are no longer used
+        for file in os.listdir(os.path.join(app.srcdir, tags_output_dir)):
+            filename = os.path.join(app.srcdir, tags_output_dir, file)
+            if (
+                file.endswith("md") or file.endswith("rst")
+            ) and filename not in created:
+                os.remove(filename)
+
+        # Documents that share a physical file with an already scanned one
+        cache_hits = len(entries) - len({key for key, _ in entries.values()})
+        logger.info(
+            f"Tags updated ({len(entries)} documents scanned, "
+            f"{cache_hits} symlink cache hits)",
+            color="white",
+        )
     else:
         logger.info(
             "Tags were not created (tags_create_tags=False in conf.py)", color="white"
         )
+        if app.config.tags_only:
+            logger.warning(
+                "tags_only is ignored, since tags_create_tags=False in conf.py"
+            )
+
+
+def resolve_missing_tag(app, env, node, contnode):
+    """Render links to tag pages as plain text if tag pages are not created."""
+    if node.get("reftarget", "").startswith("sphx_tag_"):
+        if not app.config.tags_create_tags:
+            return contnode
+    return None
 
 
 def setup(app):
@@ -440,6 +737,7 @@ def setup(app):
     app.add_config_value("tags_index_head", "Tags", "html")
     app.add_config_value("tags_create_badges", False, "html")
     app.add_config_value("tags_badge_colors", {}, "html")
+    app.add_config_value("tags_only", [], "env")
 
     # internal config values
     app.add_config_value(
@@ -450,16 +748,23 @@ def setup(app):
         "html",
     )
 
-    # Update tags
-    # TODO: tags should be updated after sphinx-gallery is generated, and the
-    # gallery is also connected to builder-inited. Are there situations when
-    # this will not work?
-    app.connect("builder-inited", update_tags)
+    # Update tags after extensions that generate sources on builder-inited with
+    # the default priority have run, such as sphinx-gallery and autosummary
+    app.connect("builder-inited", update_tags, priority=TAGS_UPDATE_PRIORITY)
+    app.connect("missing-reference", resolve_missing_tag)
+    # Restrict the build to the documents selected by tags_only. Toctrees are
+    # pruned before the toctree collector records them.
+    app.connect("env-get-outdated", exclude_unselected_docs)
+    app.connect("env-before-read-docs", skip_unselected_docs)
+    app.connect("doctree-read", prune_toctrees, priority=400)
+    app.connect("env-purge-doc", purge_pruned_toctrees)
+    app.connect("env-merge-info", merge_pruned_toctrees)
+    app.connect("env-updated", drop_unselected_docs)
     app.add_directive("tags", TagLinks)
 
     return {
         "version": __version__,
         "parallel_read_safe": True,
         "parallel_write_safe": True,
-        "env_version": 1,
+        "env_version": 2,
     }
@@ -0,0 +1,15 @@
+from pathlib import Path
+
+extensions = ["sphinx_tags"]
+tags_create_tags = True
+tags_extension = ["rst"]
+
+
+def generate_page(app):
+    """Write a tagged source on builder-inited, like sphinx-gallery and autosummary"""
+    page = Path(app.srcdir) / "generated.rst"
+    page.write_text("Generated\n=========\n\n.. tags:: tag_1, generated\n")
+
+
+def setup(app):
+    app.connect("builder-inited", generate_page)
@@ -5,6 +5,7 @@ from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
+from bs4 import BeautifulSoup
 
 from sphinx.errors import ExtensionError
 from sphinx.testing.util import SphinxTestApp
@@ -106,3 +107,120 @@ def test_empty_taglinks():
     msg = "No tags passed to 'tags' directive"
     with pytest.raises(ExtensionError, match=msg):
         tag_links.run()
+
+
+@pytest.mark.sphinx("text", testroot="generated")
+def test_generated_sources(app: SphinxTestApp, status: StringIO, warning: StringIO):
+    """Sources generated on builder-inited are tagged in a single build"""
+    app.build(force_all=True)
+    assert "build succeeded" in status.getvalue()
+    assert not warning.getvalue().strip()
+
+    build_dir = Path(app.srcdir) / "_build" / "text"
+    assert "Generated" in (build_dir / "_tags" / "generated.txt").read_text()
+    tag_1 = (build_dir / "_tags" / "tag_1.txt").read_text()
+    assert "Page 1" in tag_1
+    assert "Generated" in tag_1
+
+
+@pytest.mark.parametrize(
+    "page, expected_href",
+    [
+        pytest.param(
+            "page_1.html",
+            "_tags/tag_1.html#sphx-tag-tag-1",
+            marks=pytest.mark.sphinx("html", testroot="rst"),
+        ),
+        pytest.param(
+            "page_1/index.html",
+            "../_tags/tag_1/#sphx-tag-tag-1",
+            marks=pytest.mark.sphinx("dirhtml", testroot="rst"),
+        ),
+        pytest.param(
+            "index.html",
+            "#document-_tags/tag_1#sphx-tag-tag-1",
+            marks=pytest.mark.sphinx("singlehtml", testroot="rst"),
+        ),
+    ],
+    ids=["html", "dirhtml", "singlehtml"],
+)
+def test_tag_links(app: SphinxTestApp, page: str, expected_href: str):
+    """Tag links are resolved for the builder used to write the page"""
+    app.build(force_all=True)
+
+    html = (Path(app.outdir) / page).read_text()
+    soup = BeautifulSoup(html, "html.parser")
+    links = soup.find("p", class_="tags").find_all("a")
+    assert [link.text for link in links] == ["tag_1", "tag2", "tag 3", "[{(tag 4)}]"]
+    assert links[0]["href"] == expected_href
+
+
+@pytest.mark.sphinx("text", testroot="rst", confoverrides={"tags_create_tags": False})
+def test_tag_links_without_tag_pages(app: SphinxTestApp, warning: StringIO):
+    app.build(force_all=True)
+    assert "undefined label" not in warning.getvalue()
+    assert "Tags: tag_1, tag2" in (Path(app.outdir) / "page_1.txt").read_text()
+
+
+@pytest.mark.sphinx("text", testroot="rst", confoverrides={"tags_only": ["tag_5"]})
+def test_tags_only(app: SphinxTestApp, status: StringIO, warning: StringIO):
+    """Only documents with the selected tags, and their tag pages, are built"""
+    app.build(force_all=True)
+    assert "build succeeded" in status.getvalue()
+    assert not warning.getvalue().strip()
+
+    assert {"index", "page_2", "page_5"} <= app.env.found_docs
+    assert not {"page_1", "subdir/page_3"} & app.env.found_docs
+
+    build_dir = Path(app.srcdir) / "_build" / "text"
+
+    tagsindex = (build_dir / "_tags" / "tagsindex.txt").read_text()
+    assert "tag_1 (2)" in tagsindex
+    assert "tag_5 (2)" in tagsindex
+    assert "[{(tag 4)}] (1)" in tagsindex
+    assert "Page 1" not in (build_dir / "_tags" / "tag_1.txt").read_text()
+
+
+@pytest.mark.sphinx("text", testroot="rst", confoverrides={"tags_only": ["tag_5"]})
+def test_tags_only_rebuild(app: SphinxTestApp, make_app, app_params):
+    """A second filtered build neither detects a config change nor reads again"""
+    app.build(force_all=True)
+
+    args, kwargs = app_params
+    second = make_app(*args, **kwargs)
+    docs_read = []
+    second.connect(
+        "env-before-read-docs",
+        lambda app, env, docnames: docs_read.extend(docnames),
+        priority=900,
+    )
+    second.build()
+    assert "config changed" not in second._status.getvalue()
+    # Tag pages written by the first build are not scanned
+    assert "6 documents scanned" in second._status.getvalue()
+    assert docs_read == []
+    assert not {"page_1", "subdir/page_3"} & second.env.found_docs
+
+
+@pytest.mark.sphinx(
+    "text",
+    testroot="rst",
+    confoverrides={"tags_only": ["tag_5"], "tags_create_tags": False},
+)
+def test_tags_only_without_tag_pages(app: SphinxTestApp, warning: StringIO):
+    app.build(force_all=True)
+    assert "tags_only is ignored" in warning.getvalue()
+    assert "page_1" in app.env.found_docs
+
+
+@pytest.mark.sphinx(
+    "text",
+    testroot="rst",
+    confoverrides={"tags_only": ["tag_5"], "tags_extension": ["txt"]},
+)
+def test_tags_only_unscanned_root_doc(app: SphinxTestApp, status: StringIO):
+    """The root document is built even if its suffix is not scanned"""
+    app.build(force_all=True)
+    assert "build succeeded" in status.getvalue()
+    assert "index" in app.env.found_docs
+    assert "page_1" not in app.env.found_docs
@@ -0,0 +1,100 @@
+"""Tests for the per-format tag scanners used to build tag pages"""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from sphinx_tags import Entry, get_tag_scanner, register_tag_scanner, scan_entries
+
+EXPECTED_TAGS = ("tag_1", "tag2", "tag 3")
+
+SOURCES = {
+    ".rst": "Title\n=====\n\n.. tags:: tag_1, tag2,\n   tag 3\n\nBody text, with commas\n",
+    ".txt": "Title\n=====\n\n.. tags::\n\n   tag_1, tag2,\n   tag 3\n\nBody\n",
+    ".md": "# Title\n```{tags} tag_1\ntag2, tag 3\n```\nBody, with commas\n",
+    ".ipynb": '   "source": [\n    ".. tags:: tag_1, tag2, tag 3"\n   ]\n',
+}
+
+
+@pytest.mark.parametrize("suffix", SOURCES)
+def test_builtin_scanners(tmp_path, suffix):
+    path = tmp_path / f"page{suffix}"
+    path.write_text(SOURCES[suffix], encoding="utf8")
+    assert Entry(path).tags == EXPECTED_TAGS
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        ":::{tags} tag_1, tag2\n:::\n",
+        "::::{tags}\ntag_1,\ntag2\n::::\n",
+        "````{tags}\ntag_1, tag2\n````\n",
+    ],
+    ids=["colon-fence", "long-colon-fence", "long-backtick-fence"],
+)
+def test_myst_fences(tmp_path, text):
+    path = tmp_path / "page.md"
+    path.write_text(text, encoding="utf8")
+    assert Entry(path).tags == ("tag_1", "tag2")
+
+
+def test_untagged_file(tmp_path):
+    path = tmp_path / "page.rst"
+    path.write_text("Title\n=====\n\nNo tags, here.\n", encoding="utf8")
+    assert Entry(path).tags == ()
+
+
+def test_unknown_suffix(tmp_path):
+    path = tmp_path / "page.unknown"
+    path.write_text("", encoding="utf8")
+    with pytest.raises(ValueError, match="Unknown file extension"):
+        Entry(path)
+
+
+@patch.dict("sphinx_tags._TAG_SCANNERS")
+def test_register_tag_scanner(tmp_path):
+    register_tag_scanner("custom", lambda text: text.split(";"))
+    assert get_tag_scanner(".custom")("a;b") == ["a", "b"]
+
+    path = tmp_path / "page.custom"
+    path.write_text("tag_1; tag2;", encoding="utf8")
+    assert Entry(path).tags == ("tag_1", "tag2")
+
+
+def test_duplicate_tags(tmp_path):
+    path = tmp_path / "page.rst"
+    path.write_text(".. tags:: tag_1, tag2, tag_1\n", encoding="utf8")
+    assert Entry(path).tags == ("tag_1", "tag2")
+
+
+def test_symlinked_files_read_once(tmp_path):
+    """Documents reached through symlinks share the scan of the physical file"""
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    (shared / "page.rst").write_text(".. tags:: tag_1, tag2\n", encoding="utf8")
+    try:
+        for name in ("a", "b"):
+            (tmp_path / name).symlink_to(shared, target_is_directory=True)
+        (tmp_path / "c.rst").symlink_to(shared / "page.rst")
+    # Creating symlinks may require extra privileges on Windows
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks are not supported")
+
+    app = SimpleNamespace(
+        srcdir=str(tmp_path),
+        config=SimpleNamespace(
+            tags_extension=["rst"], exclude_patterns=[], tags_output_dir="_tags"
+        ),
+    )
+    with patch("sphinx_tags.get_tag_scanner", wraps=get_tag_scanner) as scanner:
+        entries = scan_entries(app)
+    assert scanner.call_count == 1
+
+    paths = ["a/page.rst", "b/page.rst", "c.rst", "shared/page.rst"]
+    assert sorted(entries) == paths
+    assert len({key for key, _ in entries.values()}) == 1
+    for path in paths:
+        key, entry = entries[path]
+        assert entry.relpath(tmp_path) == path
+        assert entry.tags == ("tag_1", "tag2")